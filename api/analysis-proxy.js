@@ -1,3 +1,13 @@
+// Questions analyzed per request outside sample mode
+const MAX_QUESTIONS = 1000;
+
+const ANALYSIS_TYPES = ['wordcloud', 'sentiment', 'question-types'];
+const STRATA_FIELDS = ['Org Ids', 'Shard'];
+
+// Sample mode streams records to the ML service in batches of this many lines
+const SAMPLE_BATCH_SIZE = 500;
+const SAMPLE_TIMEOUT_MS = 10000;
+
 module.exports = async function handler(req, res) {
   // Set CORS headers
   res.setHeader('Access-Control-Allow-Origin', '*');
@@ -14,9 +24,31 @@ module.exports = async function handler(req, res) {
   }
 
   try {
-    const { type = 'wordcloud', verbs = 'false' } = req.query;
+    const { type = 'wordcloud', verbs = 'false', mode = 'full' } = req.query;
+    const externalServiceUrl = process.env.ML_SERVICE_URL;
     
-    console.log(`Analysis proxy called: type=${type}, verbs=${verbs}`);
+    console.log(`Analysis proxy called: type=${type}, verbs=${verbs}, mode=${mode}`);
+
+    if (!ANALYSIS_TYPES.includes(type)) {
+      return res.status(400).json({
+        success: false,
+        error: `Unknown analysis type: ${type}`,
+        details: `Supported types: ${ANALYSIS_TYPES.join(', ')}`
+      });
+    }
+
+    const { sample_size: sampleSize, confidence } = req.query;
+    if (!['full', 'sample'].includes(mode) ||
+        (req.query.strata && !STRATA_FIELDS.includes(req.query.strata)) ||
+        (sampleSize !== undefined && !(/^\d+$/.test(sampleSize) && Number(sampleSize) >= 2)) ||
+        (confidence !== undefined && !(Number(confidence) > 0 && Number(confidence) < 1))) {
+      return res.status(400).json({
+        success: false,
+        error: 'Invalid sample options',
+        details: `mode must be full or sample; strata must be one of: ${STRATA_FIELDS.join(', ')}; ` +
+          'sample_size must be an integer of at least 2; confidence must be between 0 and 1'
+      });
+    }
     
     // Get data from Vercel Blob
     const cloudStorage = require('./cloud-storage');
@@ -34,12 +66,12 @@ module.exports = async function handler(req, res) {
     console.log(`Loaded ${data.length} records from Vercel Blob`);
 
     // Extract questions for processing
-    const questions = data
+    const allQuestions = data
       .map(row => row['Original Question'])
-      .filter(q => q && q.trim())
-      .slice(0, 1000); // Limit for performance
+      .filter(q => q && q.trim());
+    const questions = allQuestions.slice(0, MAX_QUESTIONS); // Limit for performance
 
-    if (questions.length === 0) {
+    if (allQuestions.length === 0) {
       return res.status(400).json({
         success: false,
         error: 'No questions found',
@@ -49,7 +81,29 @@ module.exports = async function handler(req, res) {
 
     let response;
 
-    if (type === 'sentiment') {
+    if (mode === 'sample' && externalServiceUrl) {
+      // Sampled preview with confidence intervals over the full dataset
+      try {
+        response = await callExternalSampleService(externalServiceUrl, data, {
+          strata: req.query.strata,
+          sample_size: sampleSize,
+          confidence: confidence,
+          analyses: type === 'wordcloud' ? 'word-frequency' : type
+        });
+      } catch (error) {
+        if (error.status >= 400 && error.status < 500) {
+          // The request itself was rejected, so falling back would hide the error
+          return res.status(error.status).json({
+            success: false,
+            error: error.body.error || 'Invalid sample request',
+            details: 'Rejected by the ML service'
+          });
+        }
+        console.error('External ML sample service failed:', error);
+        // Fallback to the requested lightweight analysis
+        response = await lightweightAnalysis(type, questions, verbs === 'true');
+      }
+    } else if (type === 'sentiment') {
       // Simple sentiment analysis (lightweight)
       response = await lightweightSentimentAnalysis(questions);
     } else if (type === 'question-types') {
@@ -57,8 +111,6 @@ module.exports = async function handler(req, res) {
       response = await lightweightQuestionTypes(questions);
     } else {
       // For word clouds, use external service or fallback
-      const externalServiceUrl = process.env.ML_SERVICE_URL;
-      
       if (externalServiceUrl) {
         // Call external ML service
         response = await callExternalMLService(externalServiceUrl, {
@@ -75,7 +127,15 @@ module.exports = async function handler(req, res) {
 
     // Add metadata
     response.recordCount = data.length;
-    response.questionsProcessed = questions.length;
+    response.questionsTotal = allQuestions.length;
+    if (response.analysis !== 'sample') {
+      response.questionsProcessed = questions.length;
+      response.exact = questions.length === allQuestions.length;
+      response.sampled = false;
+      response.truncated = !response.exact;
+    } else {
+      response.questionsProcessed = response.sample_size;
+    }
     response.dataSource = 'vercel-blob';
     response.processingMethod = externalServiceUrl ? 'external-ml' : 'lightweight';
 
@@ -208,4 +268,54 @@ async function callExternalMLService(serviceUrl, payload) {
     // Fallback to simple processing
     return await simpleWordCloud(payload.questions, payload.verbs_only);
   }
+}
+
+async function lightweightAnalysis(type, questions, verbsOnly = false) {
+  if (type === 'sentiment') return await lightweightSentimentAnalysis(questions);
+  if (type === 'question-types') return await lightweightQuestionTypes(questions);
+  return await simpleWordCloud(questions, verbsOnly);
+}
+
+async function callExternalSampleService(serviceUrl, data, options) {
+  // Options go in the query string so the body can be streamed as ndjson
+  const url = new URL(serviceUrl);
+  url.searchParams.set('mode', 'sample');
+  Object.entries(options).forEach(([key, value]) => {
+    if (value !== undefined) url.searchParams.set(key, value);
+  });
+
+  // Send only the question and strata field, a batch of lines at a time
+  async function* ndjsonBatches() {
+    let batch = '';
+    let lines = 0;
+    for (const row of data) {
+      const question = row['Original Question'];
+      if (!question || !question.trim()) continue;
+      const record = { 'Original Question': question };
+      if (options.strata) record[options.strata] = row[options.strata];
+      batch += JSON.stringify(record) + '\n';
+      if (++lines % SAMPLE_BATCH_SIZE === 0) {
+        yield Buffer.from(batch);
+        batch = '';
+      }
+    }
+    if (batch) yield Buffer.from(batch);
+  }
+
+  const response = await fetch(url, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/x-ndjson' },
+    body: ndjsonBatches(),
+    duplex: 'half',
+    signal: AbortSignal.timeout(SAMPLE_TIMEOUT_MS)
+  });
+
+  if (!response.ok) {
+    const error = new Error(`External sample service error: ${response.status}`);
+    error.status = response.status;
+    error.body = await response.json().catch(() => ({}));
+    throw error;
+  }
+
+  return await response.json();
 } 
\ No newline at end of file
@@ -3,15 +3,20 @@
 import os
 import sys
 import json
+import csv
+import math
+import random
+import heapq
+import time
+import threading
+import tracemalloc
 import tempfile
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 import re
 from wordcloud import WordCloud
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
+from PIL import Image, ImageDraw, ImageFont
 from collections import Counter
 import nltk
 from nltk.tokenize import word_tokenize, sent_tokenize
@@ -19,6 +24,7 @@ from nltk.tag import pos_tag
 from nltk.sentiment import SentimentIntensityAnalyzer
 import io
 import base64
+from statistics import NormalDist
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -59,6 +65,59 @@ STOP_WORDS = {
     'made', 'over', 'where', 'much', 'your', 'way', 'well', 'water'
 }
 
+# Question type patterns, checked in order; the first match wins
+QUESTION_PATTERNS = {
+    'What': r'\bwhat\b',
+    'How': r'\bhow\b',
+    'Why': r'\bwhy\b',
+    'When': r'\bwhen\b',
+    'Where': r'\bwhere\b',
+    'Who': r'\bwho\b',
+    'Which': r'\bwhich\b',
+    'Can/Could': r'\b(can|could)\b',
+    'Should': r'\bshould\b',
+    'Would': r'\bwould\b',
+    'Is/Are': r'\b(is|are)\b',
+    'Do/Does': r'\b(do|does|did)\b',
+    'Will': r'\bwill\b',
+    'Has/Have': r'\b(has|have|had)\b',
+    'Other': r''
+}
+
+# Word cloud rendering defaults
+DEFAULT_LAYOUT_WIDTH = 800
+DEFAULT_LAYOUT_HEIGHT = 400
+DEFAULT_MAX_WORDS = 100
+MAX_LAYOUT_PIXELS = 2000 * 1000
+MAX_OUTPUT_WIDTH = 16000
+MAX_OUTPUT_PIXELS = 16000 * 4000
+
+# Output widths rendered from a single layout
+RENDER_SIZES = {
+    'thumbnail': 400,
+    'screen': 1600,
+    'print': 4000
+}
+
+# Outputs with more pixels than this are streamed as PNG tiles
+MAX_UNTILED_PIXELS = 2048 * 1024
+DEFAULT_TILE_SIZE = 1024
+MIN_TILE_SIZE = 64
+MAX_TILE_SIZE = 4096
+
+# Serializes opt-in tracemalloc measurement, which is process-wide
+TRACEMALLOC_LOCK = threading.Lock()
+
+# Sample mode defaults
+QUESTION_FIELD = 'Original Question'
+DEFAULT_SAMPLE_SIZE = 200
+MIN_STRATUM_SAMPLE = 2
+OTHER_STRATUM = '(other)'
+MAX_REPORTED_STRATA = 50
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_TOP_WORDS = 50
+SAMPLE_ANALYSES = ('sentiment', 'question-types', 'word-frequency')
+
 def get_default_verb_settings():
     """Return default verb extraction settings."""
     return {
@@ -136,35 +195,186 @@ def process_text(text, verbs_only=False, settings=None):
         ]
         return ' '.join(filtered_words)
 
-def generate_wordcloud_image(text, width=800, height=400):
+def generate_wordcloud_layout(text, width=DEFAULT_LAYOUT_WIDTH, height=DEFAULT_LAYOUT_HEIGHT,
+                              max_words=DEFAULT_MAX_WORDS):
+    """Compute a word cloud layout on a width x height canvas.
+    
+    The occupancy-map search runs only here, so keep the canvas small and
+    rasterize larger outputs from the layout with a scale factor.
+    """
+    return WordCloud(
+        width=width,
+        height=height,
+        background_color='white',
+        max_words=max_words,
+        relative_scaling=0.5,
+        colormap='viridis'
+    ).generate(text)
+
+def prepare_wordcloud_glyphs(wordcloud, scale):
+    """Scale a word cloud layout, returning (word, font, position, bbox, color) tuples."""
+    fonts = {}
+    glyphs = []
+    for (word, count), font_size, position, orientation, color in wordcloud.layout_:
+        size = max(1, int(font_size * scale))
+        font = fonts.get((size, orientation))
+        if font is None:
+            font = ImageFont.TransposedFont(
+                ImageFont.truetype(wordcloud.font_path, size), orientation=orientation
+            )
+            fonts[(size, orientation)] = font
+        
+        # Layout positions are (row, column). The bounding box is padded by
+        # the font size since TransposedFont drops the glyph offsets.
+        x, y = int(position[1] * scale), int(position[0] * scale)
+        left, top, right, bottom = font.getbbox(word)
+        bbox = (x + left - size, y + top - size, x + right + size, y + bottom + size)
+        glyphs.append((word, font, (x, y), bbox, color))
+    return glyphs
+
+def render_wordcloud_region(wordcloud, glyphs, left, top, width, height):
+    """Rasterize the part of a scaled layout inside a width x height region."""
+    image = Image.new(wordcloud.mode, (width, height), wordcloud.background_color)
+    draw = ImageDraw.Draw(image)
+    for word, font, (x, y), (x0, y0, x1, y1), color in glyphs:
+        # Skip words entirely outside the region
+        if x1 <= left or x0 >= left + width or y1 <= top or y0 >= top + height:
+            continue
+        draw.text((x - left, y - top), word, fill=color, font=font)
+    return image
+
+def encode_png(image):
+    """Encode a PIL image as PNG bytes."""
+    buffer = io.BytesIO()
+    image.save(buffer, format='png')
+    return buffer.getvalue()
+
+def render_wordcloud_region_png(wordcloud, glyphs, left, top, width, height):
+    """Rasterize a region of a scaled layout and encode it as PNG bytes."""
+    return encode_png(render_wordcloud_region(wordcloud, glyphs, left, top, width, height))
+
+def render_wordcloud_png(wordcloud, scale=1):
+    """Rasterize a word cloud layout at the given scale as PNG bytes."""
+    width, height = int(wordcloud.width * scale), int(wordcloud.height * scale)
+    glyphs = prepare_wordcloud_glyphs(wordcloud, scale)
+    return render_wordcloud_region_png(wordcloud, glyphs, 0, 0, width, height)
+
+def iter_tile_regions(width, height, tile_size):
+    """Yield (left, top, width, height) for the tiles covering an image."""
+    for top in range(0, height, tile_size):
+        for left in range(0, width, tile_size):
+            yield left, top, min(tile_size, width - left), min(tile_size, height - top)
+
+def iter_wordcloud_tiles(wordcloud, scale, tile_size=DEFAULT_TILE_SIZE):
+    """Rasterize a word cloud layout at the given scale one PNG tile at a time.
+    
+    Only one tile is held in memory at once, so output size is not bounded
+    by memory. Yields dicts with the tile position, size and PNG bytes.
+    """
+    width, height = int(wordcloud.width * scale), int(wordcloud.height * scale)
+    glyphs = prepare_wordcloud_glyphs(wordcloud, scale)
+    for left, top, tile_width, tile_height in iter_tile_regions(width, height, tile_size):
+        yield {
+            'x': left,
+            'y': top,
+            'width': tile_width,
+            'height': tile_height,
+            'png': render_wordcloud_region_png(wordcloud, glyphs, left, top, tile_width, tile_height)
+        }
+
+def measure_render(func, *args, measure_memory=False):
+    """Call func, returning its result, elapsed seconds and peak traced bytes.
+    
+    tracemalloc is process-wide, so memory measurement is opt-in and
+    serialized with TRACEMALLOC_LOCK. The peak covers Python allocations made
+    during the call, including any from other threads running meanwhile.
+    Pillow's pixel buffers are not traced. Without measure_memory the peak
+    is None.
+    """
+    if not measure_memory:
+        started = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - started, None
+    
+    with TRACEMALLOC_LOCK:
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            started = time.perf_counter()
+            result = func(*args)
+            seconds = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+    return result, seconds, peak
+
+def iter_wordcloud_renders(wordcloud, sizes, tile_size=DEFAULT_TILE_SIZE, measure_memory=False):
+    """Rasterize one layout at several output widths, measuring each size.
+    
+    sizes maps a size name to an output width. Outputs up to
+    MAX_UNTILED_PIXELS are yielded as a single 'image' event, larger ones as
+    'tile' events. Each size ends with a 'metrics' event. Its time and
+    memory peak cover only the rasterize and encode steps, not the consumer
+    of the events. estimated_raster_bytes is the computed size of the
+    largest pixel buffer held at once.
+    """
+    channels = len(wordcloud.mode)
+    for name, output_width in sizes.items():
+        scale = output_width / wordcloud.width
+        width, height = int(wordcloud.width * scale), int(wordcloud.height * scale)
+        tiled = width * height > MAX_UNTILED_PIXELS
+        
+        glyphs, seconds, peak_python_bytes = measure_render(
+            prepare_wordcloud_glyphs, wordcloud, scale, measure_memory=measure_memory
+        )
+        
+        tiles = 0
+        regions = iter_tile_regions(width, height, tile_size) if tiled else [(0, 0, width, height)]
+        for left, top, region_width, region_height in regions:
+            png, elapsed, peak = measure_render(
+                render_wordcloud_region_png, wordcloud, glyphs, left, top, region_width, region_height,
+                measure_memory=measure_memory
+            )
+            seconds += elapsed
+            if measure_memory:
+                peak_python_bytes = max(peak_python_bytes, peak)
+            
+            if tiled:
+                tiles += 1
+                yield {'type': 'tile', 'size': name, 'x': left, 'y': top,
+                       'width': region_width, 'height': region_height, 'png': png}
+            else:
+                yield {'type': 'image', 'size': name, 'width': width, 'height': height, 'png': png}
+        
+        if tiled:
+            raster_bytes = min(tile_size, width) * min(tile_size, height) * channels
+        else:
+            raster_bytes = width * height * channels
+        
+        memory = f"peak Python {peak_python_bytes} bytes, " if measure_memory else ""
+        print(f"Rendered {name} word cloud {width}x{height} in {seconds:.2f}s "
+              f"({memory}estimated raster {raster_bytes} bytes)")
+        yield {
+            'type': 'metrics',
+            'size': name,
+            'width': width,
+            'height': height,
+            'tiled': tiled,
+            'tiles': tiles,
+            'seconds': round(seconds, 4),
+            'peak_python_bytes': peak_python_bytes,
+            'estimated_raster_bytes': raster_bytes
+        }
+
+def generate_wordcloud_image(text, width=DEFAULT_LAYOUT_WIDTH, height=DEFAULT_LAYOUT_HEIGHT,
+                             max_words=DEFAULT_MAX_WORDS):
     """Generate word cloud image and return as base64."""
     try:
-        # Create word cloud
-        wordcloud = WordCloud(
-            width=width,
-            height=height,
-            background_color='white',
-            max_words=100,
-            relative_scaling=0.5,
-            colormap='viridis'
-        ).generate(text)
-        
-        # Create matplotlib figure
-        plt.figure(figsize=(width/100, height/100))
-        plt.imshow(wordcloud, interpolation='bilinear')
-        plt.axis('off')
-        plt.tight_layout(pad=0)
-        
-        # Save to bytes
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', bbox_inches='tight', dpi=100, facecolor='white')
-        plt.close()
-        
-        # Encode as base64
-        img_buffer.seek(0)
-        img_data = base64.b64encode(img_buffer.getvalue()).decode()
-        
-        return img_data
+        wordcloud = generate_wordcloud_layout(text, width, height, max_words)
+        return base64.b64encode(render_wordcloud_png(wordcloud)).decode()
         
     except Exception as e:
         print(f"Error generating word cloud: {e}")
@@ -206,42 +416,27 @@ def analyze_sentiment_advanced(questions):
         print(f"Error in sentiment analysis: {e}")
         return None
 
+def classify_sentiment(compound):
+    """Classify a VADER compound score as positive, negative or neutral."""
+    if compound >= 0.05:
+        return 'positive'
+    elif compound <= -0.05:
+        return 'negative'
+    return 'neutral'
+
+def classify_question_type(question):
+    """Return the first matching question type for a question."""
+    question_lower = question.lower()
+    for q_type, pattern in QUESTION_PATTERNS.items():
+        if q_type != 'Other' and pattern and re.search(pattern, question_lower):
+            return q_type
+    return 'Other'
+
 def analyze_question_types_advanced(questions):
     """Advanced question type analysis with detailed categorization."""
-    question_patterns = {
-        'What': r'\bwhat\b',
-        'How': r'\bhow\b',
-        'Why': r'\bwhy\b',
-        'When': r'\bwhen\b',
-        'Where': r'\bwhere\b',
-        'Who': r'\bwho\b',
-        'Which': r'\bwhich\b',
-        'Can/Could': r'\b(can|could)\b',
-        'Should': r'\bshould\b',
-        'Would': r'\bwould\b',
-        'Is/Are': r'\b(is|are)\b',
-        'Do/Does': r'\b(do|does|did)\b',
-        'Will': r'\bwill\b',
-        'Has/Have': r'\b(has|have|had)\b',
-        'Other': r''
-    }
-    
-    type_counts = Counter()
+    type_counts = Counter(classify_question_type(question) for question in questions)
     total_questions = len(questions)
     
-    for question in questions:
-        question_lower = question.lower()
-        categorized = False
-        
-        for q_type, pattern in question_patterns.items():
-            if q_type != 'Other' and pattern and re.search(pattern, question_lower):
-                type_counts[q_type] += 1
-                categorized = True
-                break
-        
-        if not categorized:
-            type_counts['Other'] += 1
-    
     # Convert to percentages
     result = {}
     for q_type, count in type_counts.items():
@@ -252,6 +447,250 @@ def analyze_question_types_advanced(questions):
     
     return result
 
+def reservoir_sample(records, sample_size, strata_field=None, rng=None):
+    """Draw a reservoir sample of questions from a stream of records.
+    
+    Every question gets a random key and the sample_size smallest keys are
+    kept, so the sample never exceeds sample_size. When strata_field is set
+    (e.g. 'Org Ids' or 'Shard'), the sample and the number of questions seen
+    are split by that field's value. Each stratum's share of the sample is a
+    simple random sample of that stratum.
+    
+    Returns the sampled questions and the number of questions seen, both
+    keyed by stratum. Raises ValueError for records that are not objects or
+    when no record contains strata_field.
+    """
+    rng = rng or random.Random()
+    reservoir = []
+    population = Counter()
+    has_strata_field = False
+    
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError('Each record must be an object')
+        
+        question = str(record.get(QUESTION_FIELD) or '').strip()
+        if not question:
+            continue
+        
+        if strata_field:
+            has_strata_field = has_strata_field or strata_field in record
+            stratum = str(record.get(strata_field) or '').strip() or 'unknown'
+        else:
+            stratum = 'all'
+        
+        population[stratum] += 1
+        # Max-heap on the random key, so the largest kept key is at [0]
+        entry = (-rng.random(), index, stratum, question)
+        if len(reservoir) < sample_size:
+            heapq.heappush(reservoir, entry)
+        elif entry > reservoir[0]:
+            heapq.heapreplace(reservoir, entry)
+    
+    if strata_field and population and not has_strata_field:
+        raise ValueError(f'Unknown strata field: {strata_field}')
+    
+    samples = {stratum: [] for stratum in population}
+    for _, index, stratum, question in sorted(reservoir, key=lambda entry: entry[1]):
+        samples[stratum].append(question)
+    
+    return samples, population
+
+def pool_small_strata(samples, population):
+    """Pool strata with fewer than MIN_STRATUM_SAMPLE sampled questions.
+    
+    Small strata are merged into OTHER_STRATUM. If that pool still has too
+    few questions, the strata with the fewest sampled questions join it
+    until it has enough. Since samples come from one uniform reservoir, any
+    union of strata is still a simple random sample of the merged stratum.
+    
+    Returns the pooled samples, the pooled population counts and the number
+    of original strata merged into OTHER_STRATUM.
+    """
+    kept = {stratum: questions for stratum, questions in samples.items()
+            if len(questions) >= MIN_STRATUM_SAMPLE}
+    pooled = [stratum for stratum in samples if stratum not in kept]
+    
+    pooled_size = sum(len(samples[stratum]) for stratum in pooled)
+    while pooled and pooled_size < MIN_STRATUM_SAMPLE and kept:
+        smallest = min(kept, key=lambda stratum: len(kept[stratum]))
+        pooled_size += len(kept.pop(smallest))
+        pooled.append(smallest)
+    
+    if not pooled or (not kept and len(pooled) == 1):
+        # Nothing to pool, or a single stratum anyway
+        return samples, population, 0
+    
+    pooled_samples = dict(kept)
+    pooled_samples[OTHER_STRATUM] = [q for stratum in pooled for q in samples[stratum]]
+    pooled_population = Counter({stratum: population[stratum] for stratum in kept})
+    pooled_population[OTHER_STRATUM] = sum(population[stratum] for stratum in pooled)
+    return pooled_samples, pooled_population, len(pooled)
+
+def stratified_total(moments, strata, z):
+    """Estimate a population total from per-stratum sample moments.
+    
+    moments maps stratum -> (sum, sum of squares) of a per-question value over
+    the stratum sample, and strata maps stratum -> (sample size, population
+    size). Strata missing from moments contribute only zeros. Returns
+    (estimate, margin) where margin is the half-width of the
+    normal-approximation confidence interval, including the finite
+    population correction (so fully enumerated strata add no error).
+    """
+    total = 0.0
+    variance = 0.0
+    
+    for stratum, (value_sum, value_sq_sum) in moments.items():
+        n, N = strata[stratum]
+        if n == 0:
+            continue
+        
+        mean = value_sum / n
+        total += N * mean
+        if 1 < n < N:
+            s2 = max(value_sq_sum - n * mean * mean, 0.0) / (n - 1)
+            variance += N * N * (1 - n / N) * s2 / n
+    
+    return total, z * math.sqrt(variance)
+
+def format_estimate(total, margin, lower=None, upper=None, digits=1):
+    """Format an estimate and its confidence interval, clipped to [lower, upper]."""
+    low = total - margin
+    high = total + margin
+    if lower is not None:
+        low = max(low, lower)
+    if upper is not None:
+        high = min(high, upper)
+    return {
+        'estimate': round(total, digits),
+        'lower': round(low, digits),
+        'upper': round(high, digits)
+    }
+
+def estimate_category_counts(labels_by_stratum, strata, z):
+    """Estimate population counts and percentages for categorical labels."""
+    population_size = sum(N for n, N in strata.values())
+    categories = set()
+    for labels in labels_by_stratum.values():
+        categories.update(labels)
+    
+    result = {}
+    for category in sorted(categories):
+        # Indicator values, so sum and sum of squares are both the match count
+        moments = {}
+        for stratum, labels in labels_by_stratum.items():
+            matches = sum(1 for label in labels if label == category)
+            moments[stratum] = (matches, matches)
+        
+        total, margin = stratified_total(moments, strata, z)
+        count = format_estimate(total, margin, lower=0, upper=population_size)
+        count['percentage'] = format_estimate(
+            total * 100 / population_size, margin * 100 / population_size, lower=0, upper=100
+        )
+        result[category] = count
+    
+    return result
+
+def estimate_sentiment(samples, strata, z):
+    """Estimate sentiment counts and average compound score from a sample."""
+    sia = SentimentIntensityAnalyzer()
+    population_size = sum(N for n, N in strata.values())
+    
+    compounds_by_stratum = {
+        stratum: [sia.polarity_scores(question)['compound'] for question in questions]
+        for stratum, questions in samples.items()
+    }
+    labels_by_stratum = {
+        stratum: [classify_sentiment(compound) for compound in compounds]
+        for stratum, compounds in compounds_by_stratum.items()
+    }
+    
+    result = estimate_category_counts(labels_by_stratum, strata, z)
+    moments = {
+        stratum: (sum(compounds), sum(c * c for c in compounds))
+        for stratum, compounds in compounds_by_stratum.items()
+    }
+    total, margin = stratified_total(moments, strata, z)
+    result['average_sentiment'] = format_estimate(
+        total / population_size, margin / population_size, lower=-1, upper=1, digits=4
+    )
+    return result
+
+def estimate_question_types(samples, strata, z):
+    """Estimate question type counts and percentages from a sample."""
+    labels_by_stratum = {
+        stratum: [classify_question_type(question) for question in questions]
+        for stratum, questions in samples.items()
+    }
+    return estimate_category_counts(labels_by_stratum, strata, z)
+
+def estimate_word_frequency(samples, strata, z, top_n=DEFAULT_TOP_WORDS):
+    """Estimate population word frequencies from a sample."""
+    # Per stratum and word: (sum, sum of squares) of per-question counts
+    word_moments = {}
+    for stratum, questions in samples.items():
+        for question in questions:
+            for word, count in Counter(process_text(question).split()).items():
+                moments = word_moments.setdefault(word, {}).get(stratum, (0, 0))
+                word_moments[word][stratum] = (moments[0] + count, moments[1] + count * count)
+    
+    estimates = []
+    for word, moments in word_moments.items():
+        total, margin = stratified_total(moments, strata, z)
+        estimate = format_estimate(total, margin, lower=0)
+        estimates.append({
+            'word': word,
+            'count': estimate['estimate'],
+            'lower': estimate['lower'],
+            'upper': estimate['upper']
+        })
+    
+    estimates.sort(key=lambda item: item['count'], reverse=True)
+    return estimates[:top_n]
+
+def analyze_sample(records, sample_size=DEFAULT_SAMPLE_SIZE, strata_field=None,
+                   confidence=DEFAULT_CONFIDENCE, analyses=SAMPLE_ANALYSES, seed=None):
+    """Sample a stream of records and estimate analyses with confidence intervals."""
+    samples, population = reservoir_sample(
+        records, sample_size, strata_field, random.Random(seed)
+    )
+    samples, population, pooled_strata = pool_small_strata(samples, population)
+    strata = {stratum: (len(questions), population[stratum]) for stratum, questions in samples.items()}
+    population_size = sum(population.values())
+    sampled_size = sum(len(questions) for questions in samples.values())
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    
+    data = {}
+    if population_size:
+        if 'sentiment' in analyses:
+            data['sentiment'] = estimate_sentiment(samples, strata, z)
+        if 'question-types' in analyses:
+            data['question-types'] = estimate_question_types(samples, strata, z)
+        if 'word-frequency' in analyses:
+            data['word-frequency'] = estimate_word_frequency(samples, strata, z)
+    
+    exact = sampled_size == population_size
+    print(f"Sampled {sampled_size} of {population_size} questions across {len(samples)} strata")
+    
+    # Report only the largest strata; high-cardinality fields have thousands
+    reported = sorted(strata.items(), key=lambda item: item[1][1], reverse=True)[:MAX_REPORTED_STRATA]
+    
+    return {
+        'exact': exact,
+        'sampled': not exact,
+        'confidence': confidence,
+        'population_size': population_size,
+        'sample_size': sampled_size,
+        'strata_field': strata_field,
+        'strata_count': len(strata),
+        'pooled_strata': pooled_strata,
+        'strata': {
+            stratum: {'sample': n, 'population': N}
+            for stratum, (n, N) in reported
+        },
+        'data': data
+    }
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
@@ -281,8 +720,13 @@ def generate_wordcloud_endpoint():
         if not processed_text.strip():
             return jsonify({'success': False, 'error': 'No processable text found'}), 400
         
+        try:
+            width, height, max_words = parse_layout_options(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
         # Generate word cloud image
-        img_data = generate_wordcloud_image(processed_text)
+        img_data = generate_wordcloud_image(processed_text, width, height, max_words)
         
         if not img_data:
             return jsonify({'success': False, 'error': 'Failed to generate word cloud'}), 500
@@ -299,6 +743,120 @@ def generate_wordcloud_endpoint():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def parse_layout_options(data):
+    """Read and validate word cloud layout width, height and max_words."""
+    try:
+        width = int(data.get('width', DEFAULT_LAYOUT_WIDTH))
+        height = int(data.get('height', DEFAULT_LAYOUT_HEIGHT))
+        max_words = int(data.get('max_words', DEFAULT_MAX_WORDS))
+    except (TypeError, ValueError):
+        raise ValueError('width, height and max_words must be integers')
+    
+    if width < 1 or height < 1 or max_words < 1:
+        raise ValueError('width, height and max_words must be positive')
+    if width * height > MAX_LAYOUT_PIXELS:
+        raise ValueError(f'Layout canvas must be at most {MAX_LAYOUT_PIXELS} pixels; render larger sizes from a smaller layout')
+    return width, height, max_words
+
+def parse_render_sizes(sizes, width=DEFAULT_LAYOUT_WIDTH, height=DEFAULT_LAYOUT_HEIGHT):
+    """Resolve size names or a {name: width} mapping into output widths.
+    
+    width and height are the layout canvas, whose aspect ratio sets each
+    output height.
+    """
+    if sizes is None:
+        return dict(RENDER_SIZES)
+    if isinstance(sizes, list):
+        unknown = [str(name) for name in sizes if name not in RENDER_SIZES]
+        if unknown:
+            raise ValueError(f'Unknown render size: {", ".join(unknown)}')
+        sizes = {name: RENDER_SIZES[name] for name in sizes}
+    if not isinstance(sizes, dict) or not sizes:
+        raise ValueError('sizes must be a list of size names or a mapping of names to widths')
+    
+    resolved = {}
+    for name, output_width in sizes.items():
+        if not isinstance(output_width, int) or not 1 <= output_width <= MAX_OUTPUT_WIDTH:
+            raise ValueError(f'Width for size {name} must be an integer between 1 and {MAX_OUTPUT_WIDTH}')
+        output_height = int(height * output_width / width)
+        if output_height < 1 or output_width * output_height > MAX_OUTPUT_PIXELS:
+            raise ValueError(f'Size {name} would be {output_width}x{output_height}; '
+                             f'outputs must be 1 to {MAX_OUTPUT_PIXELS} pixels')
+        resolved[name] = output_width
+    return resolved
+
+@app.route('/wordcloud/render', methods=['POST'])
+def render_wordcloud_endpoint():
+    """Render one word cloud layout at several output sizes.
+    
+    The layout is computed once on the width x height canvas, then each
+    requested size is rasterized from it. The response is streamed as
+    newline-delimited JSON: a 'layout' event, then per size either an
+    'image' event or a series of 'tile' events followed by a 'metrics'
+    event, and a final 'done' event. PNG data is base64 encoded. Set
+    measure_memory to report peak Python allocations, which serializes
+    measured renders across requests.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Request body must be a JSON object'}), 400
+        
+        questions = data.get('questions', [])
+        verbs_only = data.get('verbs_only', False)
+        settings = data.get('settings', {})
+        
+        if not questions:
+            return jsonify({'success': False, 'error': 'No questions provided'}), 400
+        
+        try:
+            width, height, max_words = parse_layout_options(data)
+            sizes = parse_render_sizes(data.get('sizes'), width, height)
+            tile_size = int(data.get('tile_size', DEFAULT_TILE_SIZE))
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if not MIN_TILE_SIZE <= tile_size <= MAX_TILE_SIZE:
+            return jsonify({'success': False, 'error': f'tile_size must be between {MIN_TILE_SIZE} and {MAX_TILE_SIZE}'}), 400
+        measure_memory = data.get('measure_memory', False) is True
+        
+        processed_text = process_text(' '.join(questions), verbs_only=verbs_only, settings=settings)
+        if not processed_text.strip():
+            return jsonify({'success': False, 'error': 'No processable text found'}), 400
+        
+        started = time.perf_counter()
+        wordcloud = generate_wordcloud_layout(processed_text, width, height, max_words)
+        layout_seconds = time.perf_counter() - started
+        
+        def generate():
+            yield json.dumps({
+                'type': 'layout',
+                'width': width,
+                'height': height,
+                'max_words': max_words,
+                'words': len(wordcloud.layout_),
+                'seconds': round(layout_seconds, 4)
+            }) + '\n'
+            
+            metrics = []
+            try:
+                for event in iter_wordcloud_renders(wordcloud, sizes, tile_size, measure_memory):
+                    if 'png' in event:
+                        event['image_data'] = base64.b64encode(event.pop('png')).decode()
+                    elif event['type'] == 'metrics':
+                        metrics.append(event)
+                    yield json.dumps(event) + '\n'
+            except Exception as e:
+                # Headers are already sent, so report the failure in the stream
+                yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+                return
+            
+            yield json.dumps({'type': 'done', 'success': True, 'metrics': metrics}) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/sentiment', methods=['POST'])
 def sentiment_analysis_endpoint():
     """Perform sentiment analysis on questions."""
@@ -346,14 +904,102 @@ def question_types_endpoint():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def parse_ndjson(lines):
+    """Yield one record per non-empty line of a newline-delimited JSON stream."""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            raise ValueError(f'Invalid JSON on line {line_number}')
+
+@app.route('/sample', methods=['POST'])
+def sample_analysis_endpoint():
+    """Estimate sentiment, question types and word frequency from a sample.
+    
+    Accepts a JSON body with 'records' (or plain 'questions'), or a streamed
+    text/csv or application/x-ndjson body with options in the query string.
+    """
+    try:
+        if request.mimetype == 'text/csv':
+            options = request.args
+            records = csv.DictReader(
+                line.decode('utf-8', errors='replace') for line in request.stream
+            )
+        elif request.mimetype == 'application/x-ndjson':
+            options = request.args
+            records = parse_ndjson(request.stream)
+        else:
+            options = request.get_json(silent=True)
+            if not isinstance(options, dict):
+                return jsonify({'success': False, 'error': 'Request body must be a JSON object'}), 400
+            records = options.get('records') or [
+                {QUESTION_FIELD: question} for question in options.get('questions') or []
+            ]
+            if not isinstance(records, list):
+                return jsonify({'success': False, 'error': 'records must be a list'}), 400
+        
+        try:
+            sample_size = int(options.get('sample_size', DEFAULT_SAMPLE_SIZE))
+            confidence = float(options.get('confidence', DEFAULT_CONFIDENCE))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'sample_size and confidence must be numbers'}), 400
+        
+        strata_field = options.get('strata') or None
+        seed = options.get('seed')
+        analyses = options.get('analyses', SAMPLE_ANALYSES)
+        if isinstance(analyses, str):
+            analyses = [analysis.strip() for analysis in analyses.split(',')]
+        
+        if sample_size < 2:
+            return jsonify({'success': False, 'error': 'sample_size must be at least 2'}), 400
+        if not 0 < confidence < 1:
+            return jsonify({'success': False, 'error': 'confidence must be between 0 and 1'}), 400
+        if strata_field is not None and not isinstance(strata_field, str):
+            return jsonify({'success': False, 'error': 'strata must be a field name'}), 400
+        if seed is not None and not isinstance(seed, (int, str)):
+            return jsonify({'success': False, 'error': 'seed must be an integer or string'}), 400
+        if not isinstance(analyses, (list, tuple)) or not analyses:
+            return jsonify({'success': False, 'error': 'analyses must be a list of analysis types'}), 400
+        unknown = [str(analysis) for analysis in analyses if analysis not in SAMPLE_ANALYSES]
+        if unknown:
+            return jsonify({'success': False, 'error': f'Unknown analysis type: {", ".join(unknown)}'}), 400
+        
+        try:
+            result = analyze_sample(records, sample_size, strata_field, confidence, analyses, seed)
+        except ValueError as e:
+            # Malformed records or strata field, possibly only found mid-stream
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        if not result['population_size']:
+            return jsonify({'success': False, 'error': 'No questions provided'}), 400
+        
+        return jsonify({
+            'success': True,
+            'message': 'Sample analysis completed' if result['sampled'] else 'Analysis completed on all questions',
+            'analysis': 'sample',
+            **result
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/analyze', methods=['POST'])
 def analyze_endpoint():
     """Unified analysis endpoint supporting multiple analysis types."""
     try:
+        # Streamed sample input carries its options in the query string
+        if request.args.get('mode') == 'sample':
+            return sample_analysis_endpoint()
+        
         data = request.get_json()
         analysis_type = data.get('type', 'wordcloud')
         questions = data.get('questions', [])
         
+        if data.get('mode') == 'sample':
+            return sample_analysis_endpoint()
+        
         if not questions:
             return jsonify({'success': False, 'error': 'No questions provided'}), 400
         
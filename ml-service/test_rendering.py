@@ -0,0 +1,67 @@
+import io
+import tracemalloc
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('nltk')
+pytest.importorskip('wordcloud')
+
+from PIL import Image
+
+import app
+
+TEXT = ' '.join(
+    ['summarize'] * 12 + ['medical'] * 8 + ['records'] * 6 + ['client'] * 5
+    + ['draft', 'letter', 'demand', 'treatment', 'injury', 'settlement'] * 2
+)
+
+
+@pytest.fixture(scope='module')
+def wordcloud():
+    return app.generate_wordcloud_layout(TEXT, width=200, height=100, max_words=50)
+
+
+def test_layout_rasterizes_at_each_size(wordcloud):
+    for scale in (0.5, 1, 4):
+        image = Image.open(io.BytesIO(app.render_wordcloud_png(wordcloud, scale)))
+        assert image.size == (int(200 * scale), int(100 * scale))
+
+
+def test_tiles_stitch_to_full_render(wordcloud):
+    full = Image.open(io.BytesIO(app.render_wordcloud_png(wordcloud, 3))).convert('RGB')
+    stitched = Image.new('RGB', full.size)
+    for tile in app.iter_wordcloud_tiles(wordcloud, 3, tile_size=128):
+        stitched.paste(Image.open(io.BytesIO(tile['png'])), (tile['x'], tile['y']))
+
+    assert list(stitched.getdata()) == list(full.getdata())
+
+
+def test_large_sizes_are_tiled_and_measured(wordcloud, monkeypatch):
+    monkeypatch.setattr(app, 'MAX_UNTILED_PIXELS', 100 * 50)
+    events = list(app.iter_wordcloud_renders(
+        wordcloud, {'thumbnail': 100, 'print': 800}, tile_size=256, measure_memory=True
+    ))
+
+    metrics = {e['size']: e for e in events if e['type'] == 'metrics'}
+    assert metrics['thumbnail']['tiled'] is False
+    assert metrics['print']['tiled'] is True
+    assert metrics['print']['tiles'] == len([e for e in events if e['type'] == 'tile']) == 4 * 2
+    assert metrics['print']['estimated_raster_bytes'] == 256 * 256 * 3
+    assert all(m['seconds'] >= 0 and m['peak_python_bytes'] > 0 for m in metrics.values())
+
+
+def test_memory_measurement_is_opt_in_and_stops_on_close(wordcloud):
+    events = app.iter_wordcloud_renders(wordcloud, {'thumbnail': 100}, measure_memory=True)
+    next(events)
+    events.close()
+    assert not tracemalloc.is_tracing()
+
+    metrics = [e for e in app.iter_wordcloud_renders(wordcloud, {'thumbnail': 100}) if e['type'] == 'metrics']
+    assert metrics[0]['peak_python_bytes'] is None
+
+
+def test_render_sizes_are_bounded():
+    with pytest.raises(ValueError):
+        app.parse_render_sizes({'x': 16000}, width=10, height=200000)
+    assert app.parse_render_sizes(['print'], width=1000, height=500) == {'print': 4000}
@@ -0,0 +1,86 @@
+import csv
+import os
+from collections import Counter
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('nltk')
+pytest.importorskip('wordcloud')
+
+import app
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'sample_data.csv')
+
+
+@pytest.fixture(scope='module')
+def records():
+    with open(DATA_PATH, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.fixture(scope='module')
+def questions(records):
+    return [r[app.QUESTION_FIELD].strip() for r in records if (r[app.QUESTION_FIELD] or '').strip()]
+
+
+def test_fully_enumerated_stratum_has_zero_margin():
+    total, margin = app.stratified_total({'a': (6.0, 14.0)}, {'a': (3, 3)}, 1.96)
+    assert total == 6.0
+    assert margin == 0.0
+
+
+def test_full_enumeration_is_exact(records, questions):
+    result = app.analyze_sample(records, sample_size=len(records), strata_field='Shard')
+
+    assert result['exact'] is True
+    assert result['sampled'] is False
+    assert result['sample_size'] == result['population_size'] == len(questions)
+
+    expected = app.analyze_question_types_advanced(questions)
+    for q_type, estimate in result['data']['question-types'].items():
+        assert estimate['estimate'] == estimate['lower'] == estimate['upper'] == expected[q_type]['count']
+    for estimate in result['data']['word-frequency']:
+        assert estimate['lower'] == estimate['count'] == estimate['upper']
+
+
+def test_sampled_intervals_contain_true_counts(records, questions):
+    result = app.analyze_sample(records, sample_size=300, strata_field='Org Ids', confidence=0.99, seed=7)
+
+    assert result['exact'] is False
+    assert result['population_size'] == len(questions)
+
+    expected = app.analyze_question_types_advanced(questions)
+    for q_type, estimate in result['data']['question-types'].items():
+        assert estimate['lower'] <= expected[q_type]['count'] <= estimate['upper']
+
+    word_counts = Counter()
+    for question in questions:
+        word_counts.update(app.process_text(question).split())
+    for estimate in result['data']['word-frequency'][:10]:
+        assert estimate['lower'] <= word_counts[estimate['word']] <= estimate['upper']
+
+
+def test_sample_size_is_overall_budget(records):
+    result = app.analyze_sample(records, sample_size=100, strata_field='Org Ids', seed=1)
+
+    assert result['sample_size'] == 100
+    assert result['pooled_strata'] > 0
+    assert len(result['strata']) <= app.MAX_REPORTED_STRATA
+    assert all(s['sample'] >= app.MIN_STRATUM_SAMPLE for s in result['strata'].values())
+
+
+def test_small_strata_pool_into_other():
+    samples = {'a': ['a1', 'a2', 'a3'], 'b': ['b1', 'b2'], 'c': ['c1'], 'd': []}
+    population = {'a': 30, 'b': 20, 'c': 5, 'd': 3}
+    pooled, pooled_population, count = app.pool_small_strata(samples, population)
+
+    # c and d alone have one question, so the smallest kept stratum b joins them
+    assert count == 3
+    assert pooled == {'a': ['a1', 'a2', 'a3'], app.OTHER_STRATUM: ['c1', 'b1', 'b2']}
+    assert pooled_population == {'a': 30, app.OTHER_STRATUM: 28}
+
+
+def test_unknown_strata_field_is_rejected(records):
+    with pytest.raises(ValueError):
+        app.analyze_sample(records, strata_field='Org Ids|Shard')